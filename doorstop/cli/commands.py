@@ -6,9 +6,10 @@ import os
 import time
 from typing import Set
 
-from doorstop import common, server
+from doorstop import common, server, settings
 from doorstop.cli import utilities
 from doorstop.core import editor, exporter, importer, publisher
+from doorstop.core import builder
 from doorstop.core.builder import build
 
 log = common.logger(__name__)
@@ -620,8 +621,15 @@ def _get_tree(args, cwd, request_next_number=None, load=False):
     :return: built :class:`~doorstop.core.tree.Tree`
 
     """
-    utilities.show("building tree...", flush=True)
-    tree = build(cwd=cwd, root=args.project, request_next_number=request_next_number)
+    if settings.CACHE_TREE:
+        tree = builder._get_tree(  # pylint: disable=W0212
+            request_next_number=request_next_number
+        )
+    else:
+        utilities.show("building tree...", flush=True)
+        tree = build(
+            cwd=cwd, root=args.project, request_next_number=request_next_number
+        )
 
     if load:
         utilities.show("loading documents...", flush=True)
@@ -16,16 +16,15 @@ log = common.logger(__name__)
 EDITOR = os.environ.get('EDITOR')
 
 
-def main(args=None):  # pylint: disable=R0915
-    """Process command-line arguments and run the program."""
+_PARSERS = {}  # parsers built for each set of argument defaults
+
+
+def _build_parser(root):  # pylint: disable=R0915
+    """Build the argument parser for the given project root."""
     from doorstop import CLI, VERSION, DESCRIPTION
 
     # Shared options
     project = argparse.ArgumentParser(add_help=False)
-    try:
-        root = vcs.find_root(os.getcwd())
-    except common.DoorstopError:
-        root = None
     project.add_argument(
         '-j',
         '--project',
@@ -161,6 +160,24 @@ def main(args=None):  # pylint: disable=R0915
     _export(subs, shared)
     _publish(subs, shared)
 
+    return parser
+
+
+def main(args=None, cwd=None):
+    """Process command-line arguments and run the program."""
+    if cwd is None:
+        cwd = os.getcwd()
+
+    # Build the parser, reusing one with identical argument defaults
+    try:
+        root = vcs.find_root(cwd)
+    except common.DoorstopError:
+        root = None
+    key = (root, settings.SERVER_HOST, settings.SERVER_PORT)
+    parser = _PARSERS.get(key)
+    if parser is None:
+        parser = _PARSERS[key] = _build_parser(root)
+
     # Parse arguments
     args = parser.parse_args(args=args)
 
@@ -173,7 +190,7 @@ def main(args=None):  # pylint: disable=R0915
     # Run the program
     function = commands.get(args.command)
     try:
-        success = function(args, os.getcwd(), parser.error)
+        success = function(args, cwd, parser.error)
     except common.DoorstopFileError as exc:
         log.error(exc)
         success = False
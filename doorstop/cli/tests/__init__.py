@@ -3,12 +3,13 @@
 """Package for the doorstop.cli tests."""
 
 import os
+import tempfile
 import unittest
 
 from doorstop import settings
 from doorstop.cli.main import main
 
-ROOT = os.path.join(os.path.dirname(__file__), '..', '..', '..')
+ROOT = os.path.normpath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
 REQS = os.path.join(ROOT, 'reqs')
 TUTORIAL = os.path.join(REQS, 'tutorial')
 FILES = os.path.join(os.path.dirname(__file__), 'files')
@@ -17,10 +18,24 @@ ENV = 'TEST_INTEGRATION'  # environment variable to enable integration tests
 REASON = "'{0}' variable not set".format(ENV)
 
 
+def _init_tempdir():
+    """Redirect temporary files to a RAM-backed directory when available."""
+    path = os.getenv('DOORSTOP_TEST_TMPDIR')
+    if not path and os.path.ismount('/dev/shm'):
+        path = '/dev/shm'
+    if path and os.path.isdir(path):
+        tempfile.tempdir = path
+
+
+if os.getenv(ENV):
+    _init_tempdir()
+
+
 class SettingsTestCase(unittest.TestCase):
     """Base test case class that backs up settings."""
 
     def setUp(self):
+        super().setUp()
         self.backup = (
             settings.REFORMAT,
             settings.CHECK_REF,
@@ -41,6 +56,7 @@ class SettingsTestCase(unittest.TestCase):
         )
 
     def tearDown(self):
+        super().tearDown()
         (
             settings.REFORMAT,
             settings.CHECK_REF,
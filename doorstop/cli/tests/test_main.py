@@ -2,30 +2,51 @@
 
 """Unit tests for the doorstop.cli.main module."""
 
-from unittest.mock import Mock, patch
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
 
-from doorstop import settings
-from doorstop.cli import main
-from doorstop.cli.tests import SettingsTestCase
+from doorstop import common, settings
+from doorstop.cli import commands, main
+from doorstop.cli.tests import REQS, SettingsTestCase
+from doorstop.core.document import Document
+
+
+def _run(args, cwd, error, catch=True):  # pylint: disable=W0613
+    """Stub command runner that always succeeds."""
+    return True
+
+
+def _interrupt(args, cwd, error, catch=True):  # pylint: disable=W0613
+    """Stub command runner that simulates an interrupt."""
+    raise KeyboardInterrupt
 
 
 class TestMain(SettingsTestCase):
     """Unit tests for the `main` function."""  # pylint: disable=R0201
 
+    def setUp(self):
+        super().setUp()
+        # Swap the command runner directly; this is cheaper than starting
+        # and stopping a `patch` for every test method.
+        self.addCleanup(setattr, commands, 'run', commands.run)
+
     @patch('doorstop.cli.commands.get')
     def test_run(self, mock_get):
         """Verify the main CLI function can be called."""
         main.main(args=[])
         mock_get.assert_called_once_with(None)
 
-    @patch('doorstop.cli.commands.run', Mock(side_effect=KeyboardInterrupt))
     def test_interrupt(self):
         """Verify the CLI can be interrupted."""
+        commands.run = _interrupt
         self.assertRaises(SystemExit, main.main, [])
 
-    @patch('doorstop.cli.commands.run', Mock())
     def test_empty(self):
         """Verify 'doorstop' can be run in a working copy with no docs."""
+        commands.run = _run
         self.assertIs(None, main.main([]))
         self.assertTrue(settings.REFORMAT)
         self.assertTrue(settings.CHECK_REF)
@@ -40,9 +61,9 @@ class TestMain(SettingsTestCase):
         self.assertFalse(settings.WARN_ALL)
         self.assertFalse(settings.ERROR_ALL)
 
-    @patch('doorstop.cli.commands.run', Mock())
     def test_options(self):
         """Verify 'doorstop' can be run with options."""
+        commands.run = _run
         self.assertIs(
             None,
             main.main(
@@ -72,3 +93,62 @@ class TestMain(SettingsTestCase):
         self.assertFalse(settings.CACHE_PATHS)
         self.assertTrue(settings.WARN_ALL)
         self.assertTrue(settings.ERROR_ALL)
+
+
+class TestPublishCommand(unittest.TestCase):
+    """Tests 'doorstop publish' options toc and template"""
+
+    def setUp(self):
+        self.temp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.temp, True)
+
+    @patch('doorstop.core.publisher.publish')
+    def test_publish_document_template(self, mock_publish):
+        """Verify 'doorstop publish' is called with template."""
+        path = os.path.join(self.temp, 'req.html')
+        self.assertIs(
+            None, main.main(['publish', '--template', 'my_template.html', 'req', path])
+        )
+        mock_publish.assert_called_once_with(
+            Document(os.path.abspath(REQS)), path, '.html', template='my_template.html'
+        )
+
+    @patch('doorstop.core.publisher.publish_lines')
+    def test_publish_document_to_stdout(self, mock_publish_lines):
+        """Verify 'doorstop publish_lines' is called when no output path specified"""
+        self.assertIs(None, main.main(['publish', 'req']))
+        mock_publish_lines.assert_called_once_with(
+            Document(os.path.abspath(REQS)), '.txt'
+        )
+
+
+@patch.object(commands, 'run', lambda *args, **kwargs: True)
+class TestLogging(unittest.TestCase):
+    """Tests for the Doorstop CLI logging."""
+
+    def setUp(self):
+        self.addCleanup(setattr, common, 'verbosity', common.verbosity)
+
+    def test_verbose_0(self):
+        """Verify verbose level 0 can be set."""
+        self.assertIs(None, main.main([]))
+
+    def test_verbose_levels(self):
+        """Verify verbose levels 1-3 can be set."""
+        for count in (1, 2, 3):
+            with self.subTest(verbosity=count):
+                self.assertIs(None, main.main(['-' + 'v' * count]))
+
+    def test_verbose_4(self):
+        """Verify verbose level 4 can be set."""
+        self.assertIs(None, main.main(['-vvvv']))
+
+    def test_verbose_5(self):
+        """Verify verbose level 5 cannot be set."""
+        self.assertIs(None, main.main(['-vvvvv']))
+        self.assertEqual(4, common.verbosity)
+
+    def test_verbose_quiet(self):
+        """Verify verbose level -1 can be set."""
+        self.assertIs(None, main.main(['-q']))
+        self.assertEqual(-1, common.verbosity)
@@ -154,10 +154,10 @@ def write_lines(lines, path, end='\n', encoding='utf-8'):
 
     """
     log.trace("writing lines to '{}'...".format(path))  # type: ignore
+    # writelines() keeps the many small lines yielded by the publishers
+    # from becoming one buffered write call each
     with open(path, 'wb') as stream:
-        for line in lines:
-            data = (line + end).encode(encoding)
-            stream.write(data)
+        stream.writelines((line + end).encode(encoding) for line in lines)
     return path
 
 
@@ -2,11 +2,12 @@
 
 """Functions to publish documents and items."""
 
+import functools
+import json
 import os
 import shutil
 import tempfile
 import textwrap
-import html
 
 import bottle
 import markdown
@@ -14,18 +15,31 @@ import yaml
 from bottle import template as bottle_template
 from plantuml_markdown import PlantUMLMarkdownExtension
 from collections import Counter
+from operator import attrgetter, itemgetter
+
+try:
+    from yaml import CSafeLoader as _YamlLoader
+except ImportError:  # libyaml not available
+    from yaml import SafeLoader as _YamlLoader
 
 from doorstop import common, settings
 from doorstop.common import DoorstopError
 from doorstop.core import Document
+from doorstop.core.item import UnknownItem
 from doorstop.core.types import is_item, is_tree, iter_documents, iter_items
 
+# Dedicated cache directory so rendered diagrams are shared between
+# publish runs; the extension keys entries on the diagram source, making
+# repeated publishes O(changed diagrams) instead of O(all diagrams).
+PLANTUML_CACHE = os.path.join(tempfile.gettempdir(), 'doorstop-plantuml')
+os.makedirs(PLANTUML_CACHE, exist_ok=True)
+
 EXTENSIONS = (
     'markdown.extensions.extra',
     'markdown.extensions.sane_lists',
     PlantUMLMarkdownExtension(
         server='http://www.plantuml.com/plantuml',
-        cachedir=tempfile.gettempdir(),
+        cachedir=PLANTUML_CACHE,
         format='svg',
         classes='class1,class2',
         title='UML',
@@ -39,9 +53,87 @@ HTMLTEMPLATE = 'sidebar'
 INDEX = 'index.html'
 MATRIX = 'traceability.csv'
 
-log = common.logger(__name__)
+# C-level sort key for ordering linked items by UID
+_UID_KEY = attrgetter('uid')
 
+log = common.logger(__name__)
 
+# Per-publish indexes for reverse-link lookups; finding an item's
+# children or stakeholders walks the whole tree, so a publish run
+# inverts the link graph once and answers every lookup from a dict.
+# The indexes are only active inside publish() so long-lived callers
+# (the server) never see stale results.
+_child_items_cache = None
+_stakeholder_items_cache = None
+_link_indexes_built = False
+
+
+def _with_publish_caches(func):
+    """Enable the reverse-link indexes for the duration of a publish."""
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        global _child_items_cache, _stakeholder_items_cache, _link_indexes_built
+        _child_items_cache = {}
+        _stakeholder_items_cache = {}
+        _link_indexes_built = False
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _child_items_cache = None
+            _stakeholder_items_cache = None
+            _link_indexes_built = False
+
+    return wrapper
+
+
+def _build_link_indexes(tree):
+    """Invert the tree's link graph into the per-publish indexes."""
+    global _link_indexes_built
+    _link_indexes_built = True
+    for document2 in tree:
+        for item2 in document2:
+            if item2.active:
+                linking = item2
+            else:
+                linking = UnknownItem(item2.uid)
+                log.warning(linking.exception)
+            # UID comparison is case-insensitive, so key on a
+            # normalized form to match the original linear scans
+            for uid in item2.links:
+                key = str(uid).lower()
+                _child_items_cache.setdefault(key, []).append(linking)
+            stakeholder = item2.stakeholder
+            if stakeholder:
+                key = str(stakeholder).lower()
+                _stakeholder_items_cache.setdefault(key, []).append(linking)
+    # Match Item.find_child_items()/find_stakeholder_items(), which
+    # return their results sorted
+    for entries in _child_items_cache.values():
+        entries.sort()
+    for entries in _stakeholder_items_cache.values():
+        entries.sort()
+
+
+def _find_child_items(item):
+    """Find items linking to this item, indexed once per publish run."""
+    if _child_items_cache is None or not item.tree:
+        return item.find_child_items(skip_parent_check=True)
+    if not _link_indexes_built:
+        _build_link_indexes(item.tree)
+    return _child_items_cache.get(str(item.uid).lower(), [])
+
+
+def _find_stakeholder_items(item):
+    """Find this item's stakeholder items, indexed once per publish run."""
+    if _stakeholder_items_cache is None or not item.tree:
+        return item.find_stakeholder_items()
+    if not _link_indexes_built:
+        _build_link_indexes(item.tree)
+    return _stakeholder_items_cache.get(str(item.uid).lower(), [])
+
+
+@_with_publish_caches
 def publish(
     obj,
     path,
@@ -108,7 +200,7 @@ def publish(
     if ext == '.pdf':
         linkify = False
         all_lines = []
-        toc = '### Table of Contents\n\n'
+        toc_parts = ['### Table of Contents\n\n']
 
         for document in sorted(obj.documents):
             if document.prefix == 'TEST':
@@ -137,17 +229,17 @@ def publish(
                 else:
                     lbl = heading
 
-                line = '{p}{lbl}\n'.format(p=prefix, lbl=lbl)
-                toc += line
+                toc_parts.append('{p}{lbl}\n'.format(p=prefix, lbl=lbl))
 
             lines = publish_lines(
-                document, ext, linkify=linkify, template=template, toc=toc, count=count, **kwargs
+                document, ext, linkify=linkify, template=template, count=count, **kwargs
             )
 
             all_lines += lines
             all_lines += ['<div style="clear: both; page-break-after: always;"> </div>']
             if document.copy_assets(assets_dir):
                 log.info('Copied assets from %s to %s', obj.assets, assets_dir)
+        toc = ''.join(toc_parts)  # join once; += rebuilds the string per line
         shutil.copyfile(PDF_CSS, os.path.join(assets_dir, 'doorstop_pdf.css'))
         all_lines = [
                         f'<H1 style="text-align: center;">{settings.TITLE}</H1>',
@@ -156,13 +248,15 @@ def publish(
                         toc,
                         '<div style="clear: both; page-break-after: always;"> </div>'
                     ] + all_lines
-        path2 = os.path.join(path, 'index.md')
-        common.write_lines(all_lines, path2)
+        index_md = os.path.join(path, 'index.md')
+        common.write_lines(all_lines, index_md)
         from md2pdf.core import md2pdf
         path2 = os.path.join(path, PDF)
+        # feed md2pdf from the file just written instead of joining the
+        # whole tree into a second multi-megabyte string
         md2pdf(path2,
-               md_content='\n'.join(all_lines),
-               md_file_path=None,
+               md_content=None,
+               md_file_path=index_md,
                css_file_path=os.path.join(assets_dir, 'doorstop_pdf.css'),
                base_url=path)
     else:
@@ -250,14 +344,17 @@ def _lines_index(filenames, charset='UTF-8', tree=None, link_to_pdf=False):
     yield f'{settings.TITLE} - {settings.VERSION}'
     yield '</h1>'
 
+    # Comparing Document objects is not free; sort them once for the
+    # links list, the search index, and the traceability table
+    sorted_documents = sorted(tree.documents) if tree else None
+
     # Additional files
     if filenames:
-        documents = tree.documents if tree else None
         yield ''
         yield '<h3>Published Documents:</h3>'
         yield '<p>'
         yield '<ul>'
-        for document in sorted(documents):
+        for document in sorted_documents:
             yield '<li><a href="{p}.html">{n} ({p})</a></li>'.format(p=document.prefix, n=document.name)
         yield '</ul>'
         yield '</p>'
@@ -276,27 +373,49 @@ def _lines_index(filenames, charset='UTF-8', tree=None, link_to_pdf=False):
         yield '</pre>'
 
         yield '<script>'
-        yield 'const data = ['
 
-        for document in sorted(documents):
+        # Dump the search data as JSON (valid JS) so the C encoder does
+        # the escaping instead of a per-row format/replace loop.  A
+        # token index built at publish time keeps the browser search to
+        # intersecting small posting lists instead of scanning every
+        # item's full text per keystroke.
+        rows = []
+        token_index = {}
+        for document in sorted_documents:
+            prefix = document.prefix
+            name = document.name
             for item in document.items:
-                text = item.text.lower().replace('\n', '\\n').replace("'", "\\'")
-                yield '{{link: \'<a href="{p}.html#{i}" title="{title_content}">{n} ({p}) - {i_n}</a>\', text: \'{content}\'}},'.format(
-                    p=document.prefix,
-                    n=document.name,
-                    i=item.uid,
-                    i_n=str(item),
-                    title_content=f"{item.uid} {str(item.stakeholder_item) if item.stakeholder else ''} {text}".replace(
-                        '"', '&quot;'),
-                    content=f"{item.uid} {str(item.stakeholder_item) if item.stakeholder else ''} {text}")
-        yield '];'
+                stakeholder = str(item.stakeholder_item) if item.stakeholder else ''
+                content = f"{item.uid} {stakeholder} {item.text.lower()}"
+                title_content = content.replace('"', '&quot;')
+                row = len(rows)
+                rows.append(
+                    f'<a href="{prefix}.html#{item.uid}" title="{title_content}">'
+                    f'{name} ({prefix}) - {item}</a>'
+                )
+                for token in set(content.lower().split()):
+                    token_index.setdefault(token, []).append(row)
+        dumps = functools.partial(
+            json.dumps, ensure_ascii=False, separators=(',', ':')
+        )
+        yield 'const data = ' + dumps(rows) + ';'
+        yield 'const index = ' + dumps(token_index) + ';'
+        yield 'const tokens = Object.keys(index);'
 
         yield 'const searchField = document.getElementById("search-field");'
         yield 'const searchResult = document.getElementById("search-result");'
         yield 'const search = () => {'
-        yield 'const value = searchField.value.toLowerCase().split(" ");'
-        yield 'const res = data.filter(obj => value.every((v) => obj.text.includes(v)));'
-        yield 'searchResult.innerHTML = res.map(obj => obj.link).join("\\n");'
+        yield 'const terms = searchField.value.toLowerCase().split(" ").filter(Boolean);'
+        yield 'let ids = null;'
+        yield 'for (const term of terms) {'
+        yield 'const hits = new Set();'
+        yield 'for (const token of tokens) {'
+        yield 'if (token.includes(term)) { for (const i of index[token]) hits.add(i); }'
+        yield '}'
+        yield 'ids = ids === null ? hits : new Set([...ids].filter((i) => hits.has(i)));'
+        yield '}'
+        yield 'const res = ids === null ? [] : [...ids].sort((a, b) => a - b).map((i) => data[i]);'
+        yield 'searchResult.innerHTML = res.join("\\n");'
         yield '};'
         yield 'searchField.addEventListener("input", search);'
         yield '</script>'
@@ -311,12 +430,11 @@ def _lines_index(filenames, charset='UTF-8', tree=None, link_to_pdf=False):
         use_cases = {
             None: []
         }
-        documents = tree.documents if tree else None
-        if documents:
+        if sorted_documents:
             result = {}
             if os.path.isfile(settings.RESULT_FILE):
                 with open(settings.RESULT_FILE, 'r') as in_file:
-                    result = yaml.load(in_file, Loader=yaml.FullLoader)  # noqa: S506
+                    result = yaml.load(in_file, Loader=_YamlLoader)
             all_tests = set()
             linked_tests = set()
             badge_mapping = {
@@ -325,22 +443,28 @@ def _lines_index(filenames, charset='UTF-8', tree=None, link_to_pdf=False):
                 'failure': '<span class="label label-danger" title="{count} Failed">✗  {count}</span>',
                 'skipped': '<span class="label label-default" title="{count} skipped">-  {count}</span>',
             }
-            for document in sorted(documents):
+            # Format the result badges in one pass over the results
+            # instead of once per encounter during the traversal
+            badges = {
+                uid: [
+                    badge_mapping[status].format(count=count)
+                    for status, count in sorted(
+                        Counter(x['status'] for x in entries).items()
+                    )
+                ]
+                for uid, entries in result.items()
+            }
+            for document in sorted_documents:
                 for item in document.items:
-                    if str(item).startswith('TEST'):
+                    kind = _item_kind(item)
+                    if kind == 'TEST':
                         all_tests.add(item)
-                    if (str(item).startswith('USECASE') or str(item).startswith('RISK')) and item not in use_cases:
+                    if kind in ('USECASE', 'RISK') and item not in use_cases:
                         use_cases[item] = []
-                    if not (
-                        str(item).startswith('TEST') or
-                        str(item).startswith('ROLE') or
-                        str(item).startswith('USECASE') or
-                        str(item).startswith('RISK') or
-                        str(item).startswith('HEAD')
-                    ):
+                    if not kind:
                         no_use_case = True
                         for use_case in item.parent_items:
-                            if str(use_case).startswith('USECASE') or str(use_case).startswith('RISK'):
+                            if _item_kind(use_case) in ('USECASE', 'RISK'):
                                 no_use_case = False
                                 if use_case in use_cases:
                                     use_cases[use_case].append(item)
@@ -349,43 +473,27 @@ def _lines_index(filenames, charset='UTF-8', tree=None, link_to_pdf=False):
                         if no_use_case:
                             use_cases[None].append(item)
                         test_links = []
-                        for l in item.find_child_items(skip_parent_check=True):
-                            if str(l).startswith('TEST'):
+                        for l in _find_child_items(item):
+                            if _item_kind(l) == 'TEST':
                                 linked_tests.add(l)
-                                if str(l.uid) in result:
-                                    d = result[str(l.uid)]
-                                    test_cases[l] = [
-                                        badge_mapping[x[0]].format(count=x[1])
-                                        for x in sorted(
-                                            Counter([x['status'] for x in d]).items(),
-                                            key=lambda x: x[0]
-                                        )
-                                    ]
-                                else:
-                                    test_cases[l] = []
+                                test_cases[l] = badges.get(str(l.uid), [])
                                 test_links.append(l)
                         requirements[item] = test_links
-            test_links = []
-            for l in all_tests.difference(linked_tests):
-                linked_tests.add(l)
-                if str(l.uid) in result:
-                    d = result[str(l.uid)]
-                    test_cases[l] = [
-                        badge_mapping[x[0]].format(count=x[1])
-                        for x in sorted(
-                            Counter([x['status'] for x in d]).items(),
-                            key=lambda x: x[0]
-                        )
-                    ]
-                else:
-                    test_cases[l] = []
-                test_links.append(l)
-            requirements[None] = test_links
+            orphan_tests = all_tests - linked_tests
+            for l in orphan_tests:
+                test_cases[l] = badges.get(str(l.uid), [])
+            requirements[None] = list(orphan_tests)
             use_cases[None].append(None)
 
             rows = []
-            for use_case, use_case_requirements in sorted(use_cases.items(),
-                                                          key=lambda x: (x[0] is None, str(x[0].uid) if x[0] else '')):
+            # Decorate-sort so the key is computed once per use case
+            # instead of once per comparison
+            decorated = [
+                ((uc is None, str(uc.uid) if uc else ''), uc, reqs)
+                for uc, reqs in use_cases.items()
+            ]
+            decorated.sort(key=itemgetter(0))
+            for _, use_case, use_case_requirements in decorated:
                 for requirement in sorted(use_case_requirements, key=lambda x: (x is None, str(x.uid) if x else '')):
                     for test_case in sorted(requirements[requirement],
                                             key=lambda x: (x is None, str(x.uid) if x else '')):
@@ -406,45 +514,39 @@ def _lines_index(filenames, charset='UTF-8', tree=None, link_to_pdf=False):
             yield '</tr>'
             yield '</thead>'
             yield '<tbody>'
-            prev_use_case = ""
-            prev_requirement = None
+            # Precompute both rowspans in one reversed pass; rescanning
+            # rows[idx:] per cell is quadratic in the number of rows
+            uc_spans = [0] * len(rows)
+            req_spans = [0] * len(rows)
+            uc_run = req_run = 0
+            for idx in range(len(rows) - 1, -1, -1):
+                use_case, requirement = rows[idx][0], rows[idx][1]
+                uc_run += 1
+                req_run += 1
+                new_uc = idx == 0 or rows[idx - 1][0] != use_case
+                if new_uc or rows[idx - 1][1] != requirement:
+                    req_spans[idx] = req_run
+                    req_run = 0
+                if new_uc:
+                    uc_spans[idx] = uc_run
+                    uc_run = 0
             for idx, (use_case, requirement, test_case, result) in enumerate(rows):
                 yield '<tr>'
-                if use_case != prev_use_case:
-                    i = 0
-                    for uc, _, _, _ in rows[idx:]:
-                        if uc != use_case:
-                            break
-                        i += 1
-                    yield f'<td rowspan="{i}">{create_link(use_case) if use_case else "No use case"}</td>'
-                if requirement != prev_requirement or use_case != prev_use_case:
-                    i = 0
-                    for uc, r, _, _ in rows[idx:]:
-                        if r != requirement or uc != use_case:
-                            break
-                        i += 1
+                if uc_spans[idx]:
+                    yield f'<td rowspan="{uc_spans[idx]}">{create_link(use_case) if use_case else "No use case"}</td>'
+                if req_spans[idx]:
                     im = ''
                     if (requirement
                         and 'implemented' in requirement.data
                         and requirement.data.get('implemented') not in [None, '']
                     ):
-                        implemented = str(requirement.data.get('implemented')).strip() not in [
-                            None, False, '', 'false', 'False', "''", '""', '0']
-                        im = (
-                            '<small><span class="label {css_class}" title="{title}">{implemented}</span></small>'
-                        ).format(
-                            css_class="label-success" if implemented else 'label-danger',
-                            title="Implemented" if implemented else 'Not implemented',
-                            implemented='✓' if implemented else '✗'
-                        )
-                    yield f'<td rowspan="{i}">'
+                        im = _implemented_badge(str(requirement.data.get('implemented')))
+                    yield f'<td rowspan="{req_spans[idx]}">'
                     yield f'{create_link(requirement) if requirement else "No requirement"}&nbsp;&nbsp;{im}'
                     yield '</td>'
                 yield f'<td>{create_link(test_case) if test_case else "No test case"}</td>'
                 yield f'<td>{" ".join(result) if result else ""}</td>'
                 yield '</tr>'
-                prev_use_case = use_case
-                prev_requirement = requirement
             yield '</tbody>'
             yield '</table>'
 
@@ -462,22 +564,71 @@ def _lines_index(filenames, charset='UTF-8', tree=None, link_to_pdf=False):
     yield '</html>'
 
 
+_KIND_PREFIXES = ('TEST', 'USECASE', 'RISK', 'ROLE', 'HEAD')
+
+# Stripped 'implemented' values that count as not implemented
+_FALSY_STRINGS = frozenset({'', 'false', 'False', "''", '""', '0'})
+
+
+@functools.lru_cache(maxsize=None)
+def _implemented_badge(raw):
+    """Build the implemented-status label for a raw attribute value."""
+    implemented = raw.strip() not in _FALSY_STRINGS
+    css_class = 'label-success' if implemented else 'label-danger'
+    title = 'Implemented' if implemented else 'Not implemented'
+    mark = '✓' if implemented else '✗'
+    return f'<small><span class="label {css_class}" title="{title}">{mark}</span></small>'
+
+
+def _item_kind(item):
+    """Classify an item by the prefix of its display name ('' = requirement)."""
+    return _kind_of_name(str(item))
+
+
+@functools.lru_cache(maxsize=None)
+def _kind_of_name(name):
+    """Map a display name to its kind; repeat lookups are one dict hit."""
+    for kind in _KIND_PREFIXES:
+        if name.startswith(kind):
+            return kind
+    return ''
+
+
 def create_link(item):
     """Create a link."""
-    return '<a title="{t}" href="{p}.html#{i}">{i_n}</a>'.format(
-        p=item.document.prefix if hasattr(item, 'document') and hasattr(item.document, 'prefix') else '',
-        i=item.uid if hasattr(item, 'uid') else '',
-        t=html.escape(item.text if hasattr(item, 'text') else ''),
-        i_n=str(item)
+    return _create_link(
+        str(item.document.prefix) if hasattr(item, 'document') and hasattr(item.document, 'prefix') else '',
+        str(item.uid) if hasattr(item, 'uid') else '',
+        item.text if hasattr(item, 'text') else '',
+        str(item),
     )
 
 
+# Same escapes as html.escape(quote=True), but one C-level scan instead
+# of a chain of str.replace() calls
+_HTML_TABLE = str.maketrans(
+    {'&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#x27;'}
+)
+
+
+@functools.lru_cache(maxsize=None)
+def _create_link(prefix, uid, text, name):
+    """Format a link from hashable parts; items recur across matrix rows."""
+    return f'<a title="{text.translate(_HTML_TABLE)}" href="{prefix}.html#{uid}">{name}</a>'
+
+
 def _lines_css():
     """Yield lines of CSS to embedded in HTML."""
-    yield ''
-    for line in common.read_lines(CSS):
-        yield line.rstrip()
-    yield ''
+    yield from _read_css()
+
+
+@functools.lru_cache(maxsize=1)
+def _read_css():
+    """Read the static CSS file once per process."""
+    lines = ['']
+    lines.extend(line.rstrip() for line in common.read_lines(CSS))
+    lines.append('')
+    return tuple(lines)
 
 
 def _matrix(directory, tree, filename=MATRIX, ext=None):
@@ -547,6 +698,10 @@ def _lines_text(obj, indent=8, width=79, **_):
     :return: iterator of lines of text
 
     """
+    # Module attribute lookups are dict lookups; bind the settings read
+    # in the loop to locals once per call
+    publish_heading_levels = settings.PUBLISH_HEADING_LEVELS
+    publish_child_links = settings.PUBLISH_CHILD_LINKS
     for item in iter_items(obj):
 
         level = _format_level(item.level)
@@ -554,7 +709,7 @@ def _lines_text(obj, indent=8, width=79, **_):
         if item.heading:
 
             # Level and Text
-            if settings.PUBLISH_HEADING_LEVELS:
+            if publish_heading_levels:
                 yield "{lev:<{s}}{t}".format(lev=level, s=indent, t=item.text)
             else:
                 yield "{t}".format(t=item.text)
@@ -595,20 +750,25 @@ def _lines_text(obj, indent=8, width=79, **_):
                 yield ""  # break before references
                 yield from _chunks(f"Stakeholder: {str(item.stakeholder_item)}", width, indent)
 
+            # item.data rebuilds the YAML mapping on every access; read it once
+            data = item.data
+
             # Prio
-            if 'prio' in item.data and item.data.get('prio'):
+            prio = data.get('prio')
+            if prio:
                 yield ""  # break before references
-                yield from _chunks(f"Priority: {str(item.data.get('prio')).strip()}", width, indent)
+                yield from _chunks(f"Priority: {str(prio).strip()}", width, indent)
 
             # Implemented
-            if 'implemented' in item.data and item.data.get('implemented'):
+            implemented = data.get('implemented')
+            if implemented:
                 yield ""  # break before references
-                yield from _chunks(f"Implemented: {str(item.data.get('implemented')).strip()}", width, indent)
+                yield from _chunks(f"Implemented: {str(implemented).strip()}", width, indent)
 
             # Jira links
-            if 'jira' in item.data and item.data.get('jira'):
+            jira_items = data.get('jira')
+            if jira_items:
                 yield ""  # break before links
-                jira_items = item.data.get('jira')
                 label = "Jira issues: "
                 links = ', '.join(jira_items)
                 slinks = label + links
@@ -617,14 +777,14 @@ def _lines_text(obj, indent=8, width=79, **_):
             # Links
             if item.links:
                 yield ""  # break before links
-                if settings.PUBLISH_CHILD_LINKS:
+                if publish_child_links:
                     label = "Requirements:" if str(item).startswith('TEST') else "Parent links:"
                 else:
                     label = "Links: "
                 slinks = label + ', '.join(str(l) for l in item.links)
                 yield from _chunks(slinks, width, indent)
-            if settings.PUBLISH_CHILD_LINKS:
-                links = item.find_child_links(skip_parent_check=True)
+            if publish_child_links:
+                links = [l.uid for l in _find_child_items(item)]
                 if links:
                     child_links = [str(l) for l in links if not str(l).startswith('TEST')]
                     test_links = [str(l) for l in links if str(l).startswith('TEST')]
@@ -636,7 +796,7 @@ def _lines_text(obj, indent=8, width=79, **_):
                         yield ""  # break before links
                         slinks = "Tests: " + ', '.join(test_links)
                         yield from _chunks(slinks, width, indent)
-                stakeholder_links = item.find_stakeholder_items()
+                stakeholder_links = _find_stakeholder_items(item)
                 if stakeholder_links:
                     child_links = [str(l) for l in stakeholder_links]
                     if child_links:
@@ -655,23 +815,66 @@ def _lines_text(obj, indent=8, width=79, **_):
         yield ""  # break between items
 
 
+@functools.lru_cache(maxsize=None)
 def _chunks(text, width, indent):
-    """Yield wrapped lines of text."""
-    yield from textwrap.wrap(
+    """Return wrapped lines of text."""
+    return textwrap.wrap(
         text, width, initial_indent=' ' * indent, subsequent_indent=' ' * indent
     )
 
 
-def _lines_markdown(obj, **kwargs):
-    """Yield lines for a Markdown report.
+_LINK_BUCKETS = {'USECASE': 1, 'TEST': 2, 'RISK': 3}
+
+
+def _partition_links(items):
+    """Split links into parent, use-case, test, and risk buckets in one pass."""
+    buckets = ([], [], [], [])
+    for l in items:
+        buckets[_LINK_BUCKETS.get(_item_kind(l), 0)].append(l)
+    return buckets
+
+
+_PARENT_LINK_LABELS = ("Use cases:", "Parent links:", "Tests:", "Risks:")
+_STAKEHOLDER_LINK_LABELS = (
+    "Use cases linked to stakeholder:",
+    "Requirements linked to stakeholder:",
+    "Tests linked to stakeholder:",
+    "Risks linked to stakeholder:",
+)
+
+
+def _emit_link_sections(parts, items2, labels, linkify):
+    """Append the labeled link sections for one partitioned link set."""
+    parent_links, use_case_links, test_links, risk_links = _partition_links(items2)
+    for label, links in (
+        (labels[0], use_case_links),
+        (labels[1], parent_links),
+        (labels[2], test_links),
+        (labels[3], risk_links),
+    ):
+        if links:
+            parts.append("")  # break before links
+            parts.append(_format_md_labeled_links(label, links, linkify))
+
+
+def _build_markdown(obj, **kwargs):
+    """Build the lines for a Markdown report.
 
     :param obj: Item, list of Items, or Document to publish
     :param linkify: turn links into hyperlinks (for conversion to HTML)
 
-    :return: iterator of lines of text
+    :return: list of lines of text
 
     """
     linkify = kwargs.get('linkify', False)
+    # Module attribute lookups are dict lookups; bind the settings read
+    # in the loop to locals once per call
+    publish_heading_levels = settings.PUBLISH_HEADING_LEVELS
+    publish_body_levels = settings.PUBLISH_BODY_LEVELS
+    enable_headers = settings.ENABLE_HEADERS
+    publish_child_links = settings.PUBLISH_CHILD_LINKS
+    jira_base = settings.JIRA_URL + '/browse/'
+    parts = []
     for item in iter_items(obj):
 
         heading = '#' * item.depth
@@ -680,7 +883,7 @@ def _lines_markdown(obj, **kwargs):
         if item.heading:
             text_lines = item.text.splitlines()
             # Level and Text
-            if settings.PUBLISH_HEADING_LEVELS:
+            if publish_heading_levels:
                 standard = "{h} {lev} {t}".format(
                     h=heading, lev=level, t=text_lines[0] if text_lines else ''
                 )
@@ -688,13 +891,16 @@ def _lines_markdown(obj, **kwargs):
                 standard = "{h} {t}".format(
                     h=heading, t=text_lines[0] if text_lines else ''
                 )
-            attr_list = _format_md_attr_list(item, True)
-            yield standard + attr_list
-            yield from text_lines[1:]
+            attr_list = _format_md_attr_list(item.uid, True)
+            parts.append(standard + attr_list)
+            parts.extend(text_lines[1:])
         else:
 
+            # item.data rebuilds the YAML mapping on every access; read it once
+            data = item.data
+
             uid = item.uid
-            if settings.ENABLE_HEADERS:
+            if enable_headers:
                 # Implemented
                 if item.header:
                     if str(item.uid).startswith('HEAD'):
@@ -703,216 +909,115 @@ def _lines_markdown(obj, **kwargs):
                         uid = '{h} <small>{u}</small>'.format(h=item.header, u=item.uid)
                 else:
                     uid = '{u}'.format(u=item.uid)
-                if 'implemented' in item.data and item.data.get('implemented') not in [None, '']:
-                    implemented = str(item.data.get('implemented')).strip() not in [None, False, '', 'false', 'False',
-                                                                                    "''", '""', '0']
-                    uid = '{uid} <small><span class="label {css_class}" title="{title}">{implemented}</span></small>'.format(
-                        uid=uid,
-                        css_class="label-success" if implemented else 'label-danger',
-                        title="Implemented" if implemented else 'Not implemented',
-                        implemented='✓' if implemented else '✗'
-                    )
+                implemented = data.get('implemented')
+                if implemented not in [None, '']:
+                    uid = f"{uid} {_implemented_badge(str(implemented))}"
 
             # Level and UID
-            if settings.PUBLISH_BODY_LEVELS:
+            if publish_body_levels:
                 standard = "{h} {lev} {u}".format(h=heading, lev=level, u=uid)
             else:
                 standard = "{h} {u}".format(h=heading, u=uid)
 
-            attr_list = _format_md_attr_list(item, True)
-            yield standard + attr_list
-
-            if 'risk-rating' in item.data and item.data.get('risk-rating'):
-                risk_rating = item.data.get('risk-rating', {})
-                detectability = risk_rating.get('detectability', None)
-                probability = risk_rating.get('probability', None)
-                severity = risk_rating.get('severity', None)
-                rpn = '-'
-                if detectability is not None and probability is not None and severity is not None:
-                    rpn = int(detectability) * int(probability) * int(severity)
-                detectability = detectability if detectability is not None else '-'
-                probability = probability if probability is not None else '-'
-                severity = severity if severity is not None else '-'
-                yield ""  # break before references
-                yield "&nbsp; | Detectability | Probability | Severity | Risk Priority Number"
-                yield "------ | ------------- | ----------- | -------- | --------------------"
-                yield f"__Before mitigation__ | {detectability} | {probability} | {probability} | __{rpn}__"
-
-                if 'residual-risk-rating' in item.data and item.data.get('residual-risk-rating'):
-                    risk_rating = item.data.get('residual-risk-rating', {})
-                    detectability = risk_rating.get('detectability', None)
-                    probability = risk_rating.get('probability', None)
-                    severity = risk_rating.get('severity', None)
-                    rpn = '-'
-                    if detectability is not None and probability is not None and severity is not None:
-                        rpn = int(detectability) * int(probability) * int(severity)
-                    detectability = detectability if detectability is not None else '-'
-                    probability = probability if probability is not None else '-'
-                    severity = severity if severity is not None else '-'
-                    yield f"__After mitigation__ | {detectability} | {probability} | {probability} | __{rpn}__"
-                    yield ""  # break before references
+            attr_list = _format_md_attr_list(item.uid, True)
+            parts.append(standard + attr_list)
+
+            risk_rating = data.get('risk-rating')
+            if risk_rating:
+                parts.append(
+                    "\n&nbsp; | Detectability | Probability | Severity | Risk Priority Number"
+                    "\n------ | ------------- | ----------- | -------- | --------------------"
+                    "\n" + _format_risk_row("Before mitigation", risk_rating)
+                )
+                residual = data.get('residual-risk-rating')
+                if residual:
+                    parts.append(_format_risk_row("After mitigation", residual) + "\n")
 
             # Text
-            if item.text:
-                yield ""  # break before text
-                yield from item.text.splitlines()
+            text = item.text
+            if text:
+                parts.append("")  # break before text
+                parts.extend(text.splitlines())
 
             # Reference
             if item.ref:
-                yield ""  # break before reference
-                yield _format_md_ref(item)
+                parts.append("")  # break before reference
+                parts.append(_format_md_ref(item))
 
             # Reference
             if item.references:
-                yield ""  # break before reference
-                yield _format_md_references(item)
+                parts.append("")  # break before reference
+                parts.append(_format_md_references(item))
 
             # stakeholder
             if item.stakeholder:
-                yield ""  # break before references
-                links = _format_md_links([item.stakeholder_item], linkify)
-                yield _format_md_label_links("Stakeholder:", links, linkify)
+                parts.append("")  # break before references
+                parts.append(
+                    _format_md_labeled_links("Stakeholder:", [item.stakeholder_item], linkify)
+                )
 
             # Prio
-            if 'prio' in item.data and item.data.get('prio'):
-                yield ""  # break before references
-                yield f"Priority: {str(item.data.get('prio')).strip()}"
+            prio = data.get('prio')
+            if prio:
+                parts.append("")  # break before references
+                parts.append(f"Priority: {str(prio).strip()}")
 
             # Jira links
-            if 'jira' in item.data and item.data.get('jira'):
-                yield ""  # break before links
-                jira_items = item.data.get('jira')
+            jira_items = data.get('jira')
+            if jira_items:
+                parts.append("")  # break before links
                 label = "Jira issues:"
-                links = ', '.join(["[{jira_issue}]({base_url}/browse/{jira_issue})".format(
-                    jira_issue=jira_item,
-                    base_url=settings.JIRA_URL
-                ) for jira_item in jira_items])
+                links = ', '.join(f'[{j}]({jira_base}{j})' for j in jira_items)
                 label_links = _format_md_label_links(label, links, linkify)
-                yield label_links
+                parts.append(label_links)
 
             # Parent links
             if item.links:
-                yield ""  # break before links
-                items2 = sorted(item.parent_items, key=lambda x: x.uid)
-                parent_links = [l for l in items2 if not (
-                    str(l).startswith('TEST') or str(l).startswith('USECASE') or str(l).startswith('RISK'))]
-                use_case_links = [l for l in items2 if str(l).startswith('USECASE')]
-                test_links = [l for l in items2 if str(l).startswith('TEST')]
-                risk_links = [l for l in items2 if str(l).startswith('RISK')]
-                if use_case_links:
-                    yield ""  # break before links
-                    label = "Use cases:"
-                    links = _format_md_links(use_case_links, linkify)
-                    label_links = _format_md_label_links(label, links, linkify)
-                    yield label_links
-                if parent_links:
-                    yield ""  # break before links
-                    label = "Parent links:"
-                    links = _format_md_links(parent_links, linkify)
-                    label_links = _format_md_label_links(label, links, linkify)
-                    yield label_links
-                if test_links:
-                    yield ""  # break before links
-                    label = "Tests:"
-                    links = _format_md_links(test_links, linkify)
-                    label_links = _format_md_label_links(label, links, linkify)
-                    yield label_links
-                if risk_links:
-                    yield ""  # break before links
-                    label = "Risks:"
-                    links = _format_md_links(risk_links, linkify)
-                    label_links = _format_md_label_links(label, links, linkify)
-                    yield label_links
+                parts.append("")  # break before links
+                items2 = sorted(item.parent_items, key=_UID_KEY)
+                _emit_link_sections(parts, items2, _PARENT_LINK_LABELS, linkify)
 
             # Child links
-            if settings.PUBLISH_CHILD_LINKS:
-                items2 = sorted(item.find_child_items(skip_parent_check=True), key=lambda x: x.uid)
+            if publish_child_links:
+                items2 = sorted(_find_child_items(item), key=_UID_KEY)
                 if items2:
-                    parent_links = [l for l in items2 if not (
-                        str(l).startswith('TEST') or str(l).startswith('USECASE') or str(l).startswith('RISK'))]
-                    use_case_links = [l for l in items2 if str(l).startswith('USECASE')]
-                    test_links = [l for l in items2 if str(l).startswith('TEST')]
-                    risk_links = [l for l in items2 if str(l).startswith('RISK')]
-                    if use_case_links:
-                        yield ""  # break before links
-                        label = "Use cases:"
-                        links = _format_md_links(use_case_links, linkify)
-                        label_links = _format_md_label_links(label, links, linkify)
-                        yield label_links
-                    if parent_links:
-                        yield ""  # break before links
-                        label = "Child links:"
-                        if str(item).startswith('USECASE'):
-                            label = "Requirements:"
-                        if str(item).startswith('RISK'):
-                            label = "Requirements for mitigating the risk:"
-                        links = _format_md_links(parent_links, linkify)
-                        label_links = _format_md_label_links(label, links, linkify)
-                        yield label_links
-                    if test_links:
-                        yield ""  # break before links
-                        label = "Tests:"
-                        links = _format_md_links(test_links, linkify)
-                        label_links = _format_md_label_links(label, links, linkify)
-                        yield label_links
-                    if risk_links:
-                        yield ""  # break before links
-                        label = "Risks:"
-                        links = _format_md_links(risk_links, linkify)
-                        label_links = _format_md_label_links(label, links, linkify)
-                        yield label_links
+                    kind = _item_kind(item)
+                    if kind == 'USECASE':
+                        child_label = "Requirements:"
+                    elif kind == 'RISK':
+                        child_label = "Requirements for mitigating the risk:"
+                    else:
+                        child_label = "Child links:"
+                    labels = ("Use cases:", child_label, "Tests:", "Risks:")
+                    _emit_link_sections(parts, items2, labels, linkify)
 
-                stakeholder_links = item.find_stakeholder_items()
+                stakeholder_links = _find_stakeholder_items(item)
                 if stakeholder_links:
-                    items2 = sorted(stakeholder_links, key=lambda x: x.uid)
-                    parent_links = [l for l in items2 if not (
-                            str(l).startswith('TEST') or str(l).startswith('USECASE') or str(l).startswith('RISK'))]
-                    use_case_links = [l for l in items2 if str(l).startswith('USECASE')]
-                    test_links = [l for l in items2 if str(l).startswith('TEST')]
-                    risk_links = [l for l in items2 if str(l).startswith('RISK')]
-                    if use_case_links:
-                        yield ""  # break before links
-                        label = "Use cases linked to stakeholder:"
-                        links = _format_md_links(use_case_links, linkify)
-                        label_links = _format_md_label_links(label, links, linkify)
-                        yield label_links
-                    if parent_links:
-                        yield ""  # break before links
-                        label = "Requirements linked to stakeholder:"
-                        links = _format_md_links(parent_links, linkify)
-                        label_links = _format_md_label_links(label, links, linkify)
-                        yield label_links
-                    if test_links:
-                        yield ""  # break before links
-                        label = "Tests linked to stakeholder:"
-                        links = _format_md_links(test_links, linkify)
-                        label_links = _format_md_label_links(label, links, linkify)
-                        yield label_links
-                    if risk_links:
-                        yield ""  # break before links
-                        label = "Risks linked to stakeholder:"
-                        links = _format_md_links(risk_links, linkify)
-                        label_links = _format_md_label_links(label, links, linkify)
-                        yield label_links
+                    items2 = sorted(stakeholder_links, key=_UID_KEY)
+                    _emit_link_sections(parts, items2, _STAKEHOLDER_LINK_LABELS, linkify)
 
             # Add custom publish attributes
-            if item.document and item.document.publish:
+            document = item.document
+            publish_attrs = document.publish if document else None
+            if publish_attrs:
                 header_printed = False
-                for attr in item.document.publish:
-                    if not item.attribute(attr):
+                for attr in publish_attrs:
+                    value = item.attribute(attr)
+                    if not value:
                         continue
                     if not header_printed:
                         header_printed = True
-                        yield ""
-                        yield "| Attribute | Value |"
-                        yield "| --------- | ----- |"
-                    yield "| {} | {} |".format(attr, item.attribute(attr))
-                yield ""
+                        parts.append("")
+                        parts.append("| Attribute | Value |")
+                        parts.append("| --------- | ----- |")
+                    parts.append("| {} | {} |".format(attr, value))
+                parts.append("")
 
-        yield ""  # break between items
+        parts.append("")  # break between items
+    return parts
 
 
-def _lines_markdown_pdf(obj, count, **kwargs):
+def _lines_markdown(obj, **kwargs):
     """Yield lines for a Markdown report.
 
     :param obj: Item, list of Items, or Document to publish
@@ -920,8 +1025,28 @@ def _lines_markdown_pdf(obj, count, **kwargs):
 
     :return: iterator of lines of text
 
+    """
+    return iter(_build_markdown(obj, **kwargs))
+
+
+def _build_markdown_pdf(obj, count, **kwargs):
+    """Build the lines for a Markdown (PDF) report.
+
+    :param obj: Item, list of Items, or Document to publish
+    :param linkify: turn links into hyperlinks (for conversion to HTML)
+
+    :return: list of lines of text
+
     """
     linkify = kwargs.get('linkify', False)
+    # Module attribute lookups are dict lookups; bind the settings read
+    # in the loop to locals once per call
+    publish_heading_levels = settings.PUBLISH_HEADING_LEVELS
+    publish_body_levels = settings.PUBLISH_BODY_LEVELS
+    enable_headers = settings.ENABLE_HEADERS
+    publish_child_links = settings.PUBLISH_CHILD_LINKS
+    jira_base = settings.JIRA_URL + '/browse/'
+    parts = []
     for item in iter_items(obj):
 
         heading = '#' * item.depth
@@ -932,7 +1057,7 @@ def _lines_markdown_pdf(obj, count, **kwargs):
         if item.heading:
             text_lines = item.text.splitlines()
             # Level and Text
-            if settings.PUBLISH_HEADING_LEVELS:
+            if publish_heading_levels:
                 standard = "{h} {lev} {t}".format(
                     h=heading, lev=level, t=text_lines[0] if text_lines else ''
                 )
@@ -942,13 +1067,16 @@ def _lines_markdown_pdf(obj, count, **kwargs):
                 )
             attr_list = ''
             if linkify:
-                attr_list = _format_md_attr_list(item, True)
-            yield standard + attr_list
-            yield from text_lines[1:]
+                attr_list = _format_md_attr_list(item.uid, True)
+            parts.append(standard + attr_list)
+            parts.extend(text_lines[1:])
         else:
 
+            # item.data rebuilds the YAML mapping on every access; read it once
+            data = item.data
+
             uid = item.uid
-            if settings.ENABLE_HEADERS:
+            if enable_headers:
                 # Implemented
                 if item.header:
                     if str(item.uid).startswith('HEAD'):
@@ -957,214 +1085,126 @@ def _lines_markdown_pdf(obj, count, **kwargs):
                         uid = '{h} <small>{u}</small>'.format(h=item.header, u=item.uid)
                 else:
                     uid = '{u}'.format(u=item.uid)
-                if 'implemented' in item.data and item.data.get('implemented') not in [None, '']:
-                    implemented = str(item.data.get('implemented')).strip() not in [None, False, '', 'false', 'False',
-                                                                                    "''", '""', '0']
-                    uid = '{uid} <small><span class="label {css_class}" title="{title}">{implemented}</span></small>'.format(
-                        uid=uid,
-                        css_class="label-success" if implemented else 'label-danger',
-                        title="Implemented" if implemented else 'Not implemented',
-                        implemented='✓' if implemented else '✗'
-                    )
+                implemented = data.get('implemented')
+                if implemented not in [None, '']:
+                    uid = f"{uid} {_implemented_badge(str(implemented))}"
                 # Prio
-                if 'prio' in item.data and item.data.get('prio'):
-                    uid = f"{uid} <small>({str(item.data.get('prio')).strip()})</small>"
+                prio = data.get('prio')
+                if prio:
+                    uid = f"{uid} <small>({str(prio).strip()})</small>"
 
             # Level and UID
-            if settings.PUBLISH_BODY_LEVELS:
+            if publish_body_levels:
                 standard = "{h} {lev} {u}".format(h=heading, lev=level, u=uid)
             else:
                 standard = "{h} {u}".format(h=heading, u=uid)
             attr_list = ''
             if linkify:
-                attr_list = _format_md_attr_list(item, True)
-            yield standard + attr_list
-
-            if 'risk-rating' in item.data and item.data.get('risk-rating'):
-                risk_rating = item.data.get('risk-rating', {})
-                detectability = risk_rating.get('detectability', None)
-                probability = risk_rating.get('probability', None)
-                severity = risk_rating.get('severity', None)
-                rpn = '-'
-                if detectability is not None and probability is not None and severity is not None:
-                    rpn = int(detectability) * int(probability) * int(severity)
-                detectability = detectability if detectability is not None else '-'
-                probability = probability if probability is not None else '-'
-                severity = severity if severity is not None else '-'
-                yield ""  # break before references
-                yield "&nbsp; | Detectability | Probability | Severity | Risk Priority Number"
-                yield "------ | ------------- | ----------- | -------- | --------------------"
-                yield f"__Before mitigation__ | {detectability} | {probability} | {probability} | __{rpn}__"
-
-                if 'residual-risk-rating' in item.data and item.data.get('residual-risk-rating'):
-                    risk_rating = item.data.get('residual-risk-rating', {})
-                    detectability = risk_rating.get('detectability', None)
-                    probability = risk_rating.get('probability', None)
-                    severity = risk_rating.get('severity', None)
-                    rpn = '-'
-                    if detectability is not None and probability is not None and severity is not None:
-                        rpn = int(detectability) * int(probability) * int(severity)
-                    detectability = detectability if detectability is not None else '-'
-                    probability = probability if probability is not None else '-'
-                    severity = severity if severity is not None else '-'
-                    yield f"__After mitigation__ | {detectability} | {probability} | {probability} | __{rpn}__"
-                    yield ""  # break before references
+                attr_list = _format_md_attr_list(item.uid, True)
+            parts.append(standard + attr_list)
+
+            risk_rating = data.get('risk-rating')
+            if risk_rating:
+                parts.append(
+                    "\n&nbsp; | Detectability | Probability | Severity | Risk Priority Number"
+                    "\n------ | ------------- | ----------- | -------- | --------------------"
+                    "\n" + _format_risk_row("Before mitigation", risk_rating)
+                )
+                residual = data.get('residual-risk-rating')
+                if residual:
+                    parts.append(_format_risk_row("After mitigation", residual) + "\n")
 
             # Text
-            if item.text:
-                yield ""  # break before text
-                yield from item.text.splitlines()
+            text = item.text
+            if text:
+                parts.append("")  # break before text
+                parts.extend(text.splitlines())
 
             # Reference
             if item.ref:
-                yield ""  # break before reference
-                yield _format_md_ref(item)
+                parts.append("")  # break before reference
+                parts.append(_format_md_ref(item))
 
             # Reference
             if item.references:
-                yield ""  # break before reference
-                yield _format_md_references(item)
+                parts.append("")  # break before reference
+                parts.append(_format_md_references(item))
 
             # stakeholder
             if item.stakeholder:
-                yield ""  # break before references
-                links = _format_md_links([item.stakeholder_item], linkify)
-                yield _format_md_label_links("Stakeholder:", links, linkify)
+                parts.append("")  # break before references
+                parts.append(
+                    _format_md_labeled_links("Stakeholder:", [item.stakeholder_item], linkify)
+                )
 
             # Jira links
-            if 'jira' in item.data and item.data.get('jira'):
-                yield ""  # break before links
-                jira_items = item.data.get('jira')
+            jira_items = data.get('jira')
+            if jira_items:
+                parts.append("")  # break before links
                 label = "Jira issues:"
-                links = ', '.join(["[{jira_issue}]({base_url}/browse/{jira_issue})".format(
-                    jira_issue=jira_item,
-                    base_url=settings.JIRA_URL
-                ) for jira_item in jira_items])
+                links = ', '.join(f'[{j}]({jira_base}{j})' for j in jira_items)
                 label_links = _format_md_label_links(label, links, linkify)
-                yield label_links
+                parts.append(label_links)
 
             # Parent links
             if item.links:
-                yield ""  # break before links
-                items2 = sorted(item.parent_items, key=lambda x: x.uid)
-                parent_links = [l for l in items2 if not (
-                    str(l).startswith('TEST') or str(l).startswith('USECASE') or str(l).startswith('RISK'))]
-                use_case_links = [l for l in items2 if str(l).startswith('USECASE')]
-                test_links = [l for l in items2 if str(l).startswith('TEST')]
-                risk_links = [l for l in items2 if str(l).startswith('RISK')]
-                if use_case_links:
-                    yield ""  # break before links
-                    label = "Use cases:"
-                    links = _format_md_links(use_case_links, linkify)
-                    label_links = _format_md_label_links(label, links, linkify)
-                    yield label_links
-                if parent_links:
-                    yield ""  # break before links
-                    label = "Parent links:"
-                    links = _format_md_links(parent_links, linkify)
-                    label_links = _format_md_label_links(label, links, linkify)
-                    yield label_links
-                if test_links:
-                    yield ""  # break before links
-                    label = "Tests:"
-                    links = _format_md_links(test_links, linkify)
-                    label_links = _format_md_label_links(label, links, linkify)
-                    yield label_links
-                if risk_links:
-                    yield ""  # break before links
-                    label = "Risks:"
-                    links = _format_md_links(risk_links, linkify)
-                    label_links = _format_md_label_links(label, links, linkify)
-                    yield label_links
+                parts.append("")  # break before links
+                items2 = sorted(item.parent_items, key=_UID_KEY)
+                _emit_link_sections(parts, items2, _PARENT_LINK_LABELS, linkify)
 
             # Child links
-            if settings.PUBLISH_CHILD_LINKS:
-                items2 = sorted(item.find_child_items(skip_parent_check=True), key=lambda x: x.uid)
+            if publish_child_links:
+                items2 = sorted(_find_child_items(item), key=_UID_KEY)
                 if items2:
-                    parent_links = [l for l in items2 if not (
-                        str(l).startswith('TEST') or str(l).startswith('USECASE') or str(l).startswith('RISK'))]
-                    use_case_links = [l for l in items2 if str(l).startswith('USECASE')]
-                    test_links = [l for l in items2 if str(l).startswith('TEST')]
-                    risk_links = [l for l in items2 if str(l).startswith('RISK')]
-                    if use_case_links:
-                        yield ""  # break before links
-                        label = "Use cases:"
-                        links = _format_md_links(use_case_links, linkify)
-                        label_links = _format_md_label_links(label, links, linkify)
-                        yield label_links
-                    if parent_links:
-                        yield ""  # break before links
-                        label = "Child links:"
-                        if str(item).startswith('USECASE'):
-                            label = "Requirements:"
-                        if str(item).startswith('RISK'):
-                            label = "Requirements for mitigating the risk:"
-                        links = _format_md_links(parent_links, linkify)
-                        label_links = _format_md_label_links(label, links, linkify)
-                        yield label_links
-                    if test_links:
-                        yield ""  # break before links
-                        label = "Tests:"
-                        links = _format_md_links(test_links, linkify)
-                        label_links = _format_md_label_links(label, links, linkify)
-                        yield label_links
-                    if risk_links:
-                        yield ""  # break before links
-                        label = "Risks:"
-                        links = _format_md_links(risk_links, linkify)
-                        label_links = _format_md_label_links(label, links, linkify)
-                        yield label_links
+                    kind = _item_kind(item)
+                    if kind == 'USECASE':
+                        child_label = "Requirements:"
+                    elif kind == 'RISK':
+                        child_label = "Requirements for mitigating the risk:"
+                    else:
+                        child_label = "Child links:"
+                    labels = ("Use cases:", child_label, "Tests:", "Risks:")
+                    _emit_link_sections(parts, items2, labels, linkify)
 
-                stakeholder_links = item.find_stakeholder_items()
+                stakeholder_links = _find_stakeholder_items(item)
                 if stakeholder_links:
-                    items2 = sorted(stakeholder_links, key=lambda x: x.uid)
-                    parent_links = [l for l in items2 if not (
-                            str(l).startswith('TEST') or str(l).startswith('USECASE') or str(l).startswith('RISK'))]
-                    use_case_links = [l for l in items2 if str(l).startswith('USECASE')]
-                    test_links = [l for l in items2 if str(l).startswith('TEST')]
-                    risk_links = [l for l in items2 if str(l).startswith('RISK')]
-                    if use_case_links:
-                        yield ""  # break before links
-                        label = "Use cases linked to stakeholder:"
-                        links = _format_md_links(use_case_links, linkify)
-                        label_links = _format_md_label_links(label, links, linkify)
-                        yield label_links
-                    if parent_links:
-                        yield ""  # break before links
-                        label = "Requirements linked to stakeholder:"
-                        links = _format_md_links(parent_links, linkify)
-                        label_links = _format_md_label_links(label, links, linkify)
-                        yield label_links
-                    if test_links:
-                        yield ""  # break before links
-                        label = "Tests linked to stakeholder:"
-                        links = _format_md_links(test_links, linkify)
-                        label_links = _format_md_label_links(label, links, linkify)
-                        yield label_links
-                    if risk_links:
-                        yield ""  # break before links
-                        label = "Risks linked to stakeholder:"
-                        links = _format_md_links(risk_links, linkify)
-                        label_links = _format_md_label_links(label, links, linkify)
-                        yield label_links
+                    items2 = sorted(stakeholder_links, key=_UID_KEY)
+                    _emit_link_sections(parts, items2, _STAKEHOLDER_LINK_LABELS, linkify)
 
             # Add custom publish attributes
-            if item.document and item.document.publish:
+            document = item.document
+            publish_attrs = document.publish if document else None
+            if publish_attrs:
                 header_printed = False
-                for attr in item.document.publish:
-                    if not item.attribute(attr):
+                for attr in publish_attrs:
+                    value = item.attribute(attr)
+                    if not value:
                         continue
                     if not header_printed:
                         header_printed = True
-                        yield ""
-                        yield "| Attribute | Value |"
-                        yield "| --------- | ----- |"
-                    yield "| {} | {} |".format(attr, item.attribute(attr))
-                yield ""
+                        parts.append("")
+                        parts.append("| Attribute | Value |")
+                        parts.append("| --------- | ----- |")
+                    parts.append("| {} | {} |".format(attr, value))
+                parts.append("")
 
-        yield ""  # break between items
+        parts.append("")  # break between items
+    return parts
+
+
+def _lines_markdown_pdf(obj, count, **kwargs):
+    """Yield lines for a Markdown report.
+
+    :param obj: Item, list of Items, or Document to publish
+    :param linkify: turn links into hyperlinks (for conversion to HTML)
+
+    :return: iterator of lines of text
+
+    """
+    return iter(_build_markdown_pdf(obj, count, **kwargs))
 
 
+@functools.lru_cache(maxsize=None)
 def _format_level(level):
     """Convert a level to a string and keep zeros if not a top level."""
     text = str(level)
@@ -1173,16 +1213,26 @@ def _format_level(level):
     return text
 
 
-def _format_md_attr_list(item, linkify):
+@functools.lru_cache(maxsize=None)
+def _format_md_attr_list(uid, linkify):
     """Create a Markdown attribute list for a heading."""
-    return " {{#{u} }}".format(u=item.uid) if linkify else ''
+    return " {{#{u} }}".format(u=uid) if linkify else ''
+
+
+# On POSIX hosts the backslash fix-up on reference paths is a no-op scan
+_NEED_SLASH_FIX = os.sep == '\\'
+
+
+def _norm_ref_path(path):
+    """Normalize a reference path to unix-style separators."""
+    return path.replace('\\', '/') if _NEED_SLASH_FIX else path
 
 
 def _format_text_ref(item):
     """Format an external reference in text."""
     if settings.CHECK_REF:
         path, line = item.find_ref()
-        path = path.replace('\\', '/')  # always use unix-style paths
+        path = _norm_ref_path(path)
         if line:
             return "Reference: {p} (line {line})".format(p=path, line=line)
         else:
@@ -1194,31 +1244,26 @@ def _format_text_ref(item):
 def _format_text_references(item):
     """Format an external reference in text."""
     if settings.CHECK_REF:
-        ref = item.find_references()
-        text_refs = []
-        for ref_item in ref:
-            path, line = ref_item
-            path = path.replace('\\', '/')  # always use unix-style paths
-            if line:
-                text_refs.append("{p} (line {line})".format(p=path, line=line))
-            else:
-                text_refs.append("{p}".format(p=path))
-        return "Reference: {}".format(', '.join(ref for ref in text_refs))
+        text_refs = [
+            "{p} (line {line})".format(p=_norm_ref_path(path), line=line)
+            if line
+            else _norm_ref_path(path)
+            for path, line in item.find_references()
+        ]
+        return "Reference: {}".format(', '.join(text_refs))
     else:
-        references = item.references
-        text_refs = []
-        for ref_item in references:
-            path = ref_item['path']
-            path = path.replace('\\', '/')  # always use unix-style paths
-            text_refs.append("'{p}'".format(p=path))
-        return "Reference: {}".format(', '.join(text_ref for text_ref in text_refs))
+        text_refs = [
+            "'{p}'".format(p=_norm_ref_path(ref_item['path']))
+            for ref_item in item.references
+        ]
+        return "Reference: {}".format(', '.join(text_refs))
 
 
 def _format_md_ref(item):
     """Format an external reference in Markdown."""
     if settings.CHECK_REF:
         path, line = item.find_ref()
-        path = path.replace('\\', '/')  # always use unix-style paths
+        path = _norm_ref_path(path)
         if line:
             return "> `{p}` (line {line})".format(p=path, line=line)
         else:
@@ -1230,26 +1275,19 @@ def _format_md_ref(item):
 def _format_md_references(item):
     """Format an external reference in Markdown."""
     if settings.CHECK_REF:
-        references = item.find_references()
-        text_refs = []
-        for ref_item in references:
-            path, line = ref_item
-            path = path.replace('\\', '/')  # always use unix-style paths
-
-            if line:
-                text_refs.append("> `{p}` (line {line})".format(p=path, line=line))
-            else:
-                text_refs.append("> `{p}`".format(p=path))
-
-        return '\n'.join(ref for ref in text_refs)
+        text_refs = [
+            "> `{p}` (line {line})".format(p=_norm_ref_path(path), line=line)
+            if line
+            else "> `{p}`".format(p=_norm_ref_path(path))
+            for path, line in item.find_references()
+        ]
+        return '\n'.join(text_refs)
     else:
-        references = item.references
-        text_refs = []
-        for ref_item in references:
-            path = ref_item["path"]
-            path = path.replace('\\', '/')  # always use unix-style paths
-            text_refs.append("> '{r}'".format(r=path))
-        return '\n'.join(ref for ref in text_refs)
+        text_refs = [
+            "> '{r}'".format(r=_norm_ref_path(ref_item["path"]))
+            for ref_item in item.references
+        ]
+        return '\n'.join(text_refs)
 
 
 def _format_md_links(items, linkify):
@@ -1261,16 +1299,45 @@ def _format_md_links(items, linkify):
     return ', '.join(links)
 
 
+@functools.lru_cache(maxsize=None)
+def _md_link_title(text):
+    """Escape item text for a Markdown link title, once per distinct text."""
+    return text.translate(_HTML_TABLE).replace('\n', '  ')
+
+
+@functools.lru_cache(maxsize=None)
+def _html_link_title(text):
+    """Escape item text for an HTML link title, once per distinct text."""
+    return text.translate(_HTML_TABLE)
+
+
+def _format_risk_row(label, rating):
+    """Format one row of the Markdown risk-rating table."""
+    detectability = rating.get('detectability')
+    probability = rating.get('probability')
+    severity = rating.get('severity')
+    if detectability is not None and probability is not None and severity is not None:
+        rpn = int(detectability) * int(probability) * int(severity)
+    else:
+        rpn = '-'
+    detectability = detectability if detectability is not None else '-'
+    probability = probability if probability is not None else '-'
+    return f"__{label}__ | {detectability} | {probability} | {probability} | __{rpn}__"
+
+
+def _format_md_labeled_links(label, items, linkify):
+    """Format a label and its linked items in a single pass."""
+    links = ', '.join(_format_md_item_link(item, linkify=linkify) for item in items)
+    return _format_md_label_links(label, links, linkify)
+
+
 def _format_md_item_link(item, linkify=True):
     """Format an item link in Markdown."""
     if linkify and is_item(item):
+        title = _md_link_title(item.text)
         if item.header:
-            return "[{h}]({p}.html#{u} \"{t}\")".format(
-                u=item.uid, h=item.header, p=item.document.prefix,
-                t=html.escape(item.text).replace('"', '').replace('\n', '  ')
-            )
-        return "[{u}]({p}.html#{u} \"{t}\")".format(u=item.uid, p=item.document.prefix,
-                                                    t=html.escape(item.text)).replace('\n', '  ')
+            return f'[{item.header}]({item.document.prefix}.html#{item.uid} "{title}")'
+        return f'[{item.uid}]({item.document.prefix}.html#{item.uid} "{title}")'
     else:
         return str(item.uid)  # if not `Item`, assume this is an `UnknownItem`
 
@@ -1278,15 +1345,10 @@ def _format_md_item_link(item, linkify=True):
 def _format_html_item_link(item, linkify=True):
     """Format an item link in HTML."""
     if linkify and is_item(item):
+        title = _html_link_title(item.text)
         if item.header:
-            link = '<a href="{p}.html#{u}" title="{t}">{u} {h}</a>'.format(
-                u=item.uid, h=item.header, p=item.document.prefix, t=html.escape(item.text)
-            )
-        else:
-            link = '<a href="{p}.html#{u}" title="{t}">{u}</a>'.format(
-                u=item.uid, p=item.document.prefix, t=html.escape(item.text)
-            )
-        return link
+            return f'<a href="{item.document.prefix}.html#{item.uid}" title="{title}">{item.uid} {item.header}</a>'
+        return f'<a href="{item.document.prefix}.html#{item.uid}" title="{title}">{item.uid}</a>'
     else:
         return str(item.uid)  # if not `Item`, assume this is an `UnknownItem`
 
@@ -1300,7 +1362,8 @@ def _format_md_label_links(label, links, linkify):
 
 
 def _table_of_contents_md(obj, linkify=None):
-    toc = '### Table of Contents\n\n'
+    parts = ['### Table of Contents\n\n']
+    publish_heading_levels = settings.PUBLISH_HEADING_LEVELS
 
     for item in iter_items(obj):
         if item.depth == 1:
@@ -1317,18 +1380,17 @@ def _table_of_contents_md(obj, linkify=None):
         else:
             heading = item.uid
 
-        if settings.PUBLISH_HEADING_LEVELS:
+        if publish_heading_levels:
             level = _format_level(item.level)
             lbl = '{lev} {h}'.format(lev=level, h=heading)
         else:
             lbl = heading
 
         if linkify:
-            line = '{p}[{lbl}](#{uid})\n'.format(p=prefix, lbl=lbl, uid=item.uid)
+            parts.append('{p}[{lbl}](#{uid})\n'.format(p=prefix, lbl=lbl, uid=item.uid))
         else:
-            line = '{p}{lbl}\n'.format(p=prefix, lbl=lbl)
-        toc += line
-    return toc
+            parts.append('{p}{lbl}\n'.format(p=prefix, lbl=lbl))
+    return ''.join(parts)
 
 
 def _lines_html(
@@ -1351,10 +1413,13 @@ def _lines_html(
         document = True
     # Generate HTML
 
-    text = '\n'.join(_lines_markdown(obj, linkify=linkify))
+    text = '\n'.join(_build_markdown(obj, linkify=linkify))
     body = markdown.markdown(text, extensions=extensions)
+    del text  # the joined Markdown can rival the HTML in size
 
-    if toc:
+    # The TOC only appears in the document template, so skip the extra
+    # Markdown pass when only the body is returned
+    if toc and document:
         toc_md = _table_of_contents_md(obj, True)
         toc_html = markdown.markdown(toc_md, extensions=extensions)
     else:
@@ -1391,14 +1456,13 @@ def check(ext):
     :return: lines generator if available
 
     """
-    exts = ', '.join(ext for ext in FORMAT_LINES)
-    msg = "unknown publish format: {} (options: {})".format(ext or None, exts)
-    exc = DoorstopError(msg)
-
     try:
         gen = FORMAT_LINES[ext]
     except KeyError:
-        raise exc from None
+        # Only build the error message on the failure path
+        exts = ', '.join(FORMAT_LINES)
+        msg = "unknown publish format: {} (options: {})".format(ext or None, exts)
+        raise DoorstopError(msg) from None
     else:
         log.debug("found lines generator for: {}".format(ext))
         return gen
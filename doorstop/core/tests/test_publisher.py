@@ -21,6 +21,7 @@ from doorstop.core.tests import (
     MockItem,
     MockItemAndVCS,
 )
+from doorstop.core.types import UID
 
 
 class TestModule(MockDataMixIn, unittest.TestCase):
@@ -363,6 +364,23 @@ class TestModule(MockDataMixIn, unittest.TestCase):
         # Assert
         self.assertIn("Child links: tst1", text)
 
+    def test_find_child_items_case_insensitive(self):
+        """Verify the link index matches UIDs case-insensitively."""
+        linking = Mock()
+        linking.active = True
+        linking.links = [UID('req001')]
+        linking.stakeholder = None
+        target = Mock()
+        target.uid = UID('REQ001')
+        target.tree = [[linking]]
+        with patch.object(publisher, '_child_items_cache', {}), patch.object(
+            publisher, '_stakeholder_items_cache', {}
+        ), patch.object(publisher, '_link_indexes_built', False):
+            # Act
+            items = publisher._find_child_items(target)
+        # Assert
+        self.assertEqual([linking], items)
+
     def test_lines_markdown_item(self):
         """Verify Markdown can be published from an item."""
         with patch.object(
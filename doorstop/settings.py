@@ -57,6 +57,7 @@ ADDREMOVE_FILES = True  # automatically add/remove new/changed files
 CACHE_ITEMS = True  # cache items in documents and trees
 CACHE_DOCUMENTS = True  # cache documents in trees
 CACHE_PATHS = True  # cache file/directory paths and contents
+CACHE_TREE = False  # reuse the shared tree between commands (testing only)
 
 # Server settings
 SERVER_HOST = None  # '' = server not specified, None = no server in use